@@ -2,8 +2,9 @@
 
 import functools
 import logging
+import threading
 from typing import Annotated, Any, Callable, Dict, Generator, List, \
-    NamedTuple, Optional, Type, get_args, get_origin
+    NamedTuple, Optional, Tuple, Type, get_args, get_origin
 
 from ..exceptions import DashboardException
 from .nvmeof_conf import NvmeofGatewaysConfig, is_mtls_enabled
@@ -33,6 +34,18 @@ else:
     class NVMeoFClient(object):
         pb2 = pb2
 
+        # channels are shared by all clients talking to the same gateway, so
+        # each new client reuses the open connection. Entries map the gateway
+        # address to the (tls_certs, channel) pair the channel was built with.
+        _channels: Dict[str, Tuple[Optional[tuple], Any]] = {}
+        _channels_lock = threading.Lock()
+        # a shared channel outlives a gateway outage; cap gRPC's reconnect
+        # backoff (120s by default) so it notices a recovered gateway quickly
+        _channel_options = [
+            ('grpc.initial_reconnect_backoff_ms', 1000),
+            ('grpc.max_reconnect_backoff_ms', 5000),
+        ]
+
         def __init__(self, gw_group: Optional[str] = None, server_address: Optional[str] = None):
             logger.info("Initiating nvmeof gateway connection...")
             try:
@@ -71,19 +84,52 @@ else:
                 client_key = NvmeofGatewaysConfig.get_client_key(service_name)
                 client_cert = NvmeofGatewaysConfig.get_client_cert(service_name)
                 server_cert = NvmeofGatewaysConfig.get_ssl_cert(service_name)
-                logger.info('Securely connecting to: %s', self.gateway_addr)
-                credentials = grpc.ssl_channel_credentials(
-                    root_certificates=server_cert,
-                    private_key=client_key,
-                    certificate_chain=client_cert,
-                )
-                self.channel = grpc.secure_channel(self.gateway_addr, credentials)
+                self.channel = self._get_channel(self.gateway_addr,
+                                                 (server_cert, client_key, client_cert))
             else:
-                logger.info("Insecurely connecting to: %s", self.gateway_addr)
-                self.channel = grpc.insecure_channel(self.gateway_addr)
+                self.channel = self._get_channel(self.gateway_addr)
             self.stub = pb2_grpc.GatewayStub(self.channel)
             self.service_name = service_name
 
+        @classmethod
+        def _get_channel(cls, gateway_addr: str, tls_certs: Optional[tuple] = None):
+            with cls._channels_lock:
+                cached = cls._channels.get(gateway_addr)
+                if cached is not None and cached[0] == tls_certs:
+                    return cached[1]
+                # a channel built with rotated credentials is only replaced, not
+                # closed: clients created before the rotation may still be using
+                # it, and gRPC closes it once the last of them goes away
+                if tls_certs:
+                    server_cert, client_key, client_cert = tls_certs
+                    logger.info('Securely connecting to: %s', gateway_addr)
+                    credentials = grpc.ssl_channel_credentials(
+                        root_certificates=server_cert,
+                        private_key=client_key,
+                        certificate_chain=client_cert,
+                    )
+                    channel = grpc.secure_channel(gateway_addr, credentials,
+                                                  options=cls._channel_options)
+                else:
+                    logger.info("Insecurely connecting to: %s", gateway_addr)
+                    channel = grpc.insecure_channel(gateway_addr,
+                                                    options=cls._channel_options)
+                cls._channels[gateway_addr] = (tls_certs, channel)
+                return channel
+
+        @classmethod
+        def drop_channel(cls, gateway_addr: str, channel: Any):
+            """Forget a failed channel so the next client reconnects at once.
+
+            Only evicts the entry if it still holds ``channel``. The channel is
+            not closed here, as other clients may be using it; gRPC closes it
+            once the last of them goes away.
+            """
+            with cls._channels_lock:
+                cached = cls._channels.get(gateway_addr)
+                if cached is not None and cached[1] is channel:
+                    del cls._channels[gateway_addr]
+
     Model = Dict[str, Any]
     Collection = List[Model]
 
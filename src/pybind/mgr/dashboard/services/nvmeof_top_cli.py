@@ -3,13 +3,19 @@
 # https://github.com/pcuzner/ceph-nvmeof-top
 # by Paul Cuzner <pcuzner@ibm.com>
 import errno
-import json
+import io
 import logging
 import time
-from typing import Any, Optional
+from operator import itemgetter
+from typing import Any, Mapping, Optional
 
 from mgr_module import HandleCommandResult
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 from .. import mgr
 from ..cli import DBCLICommand
 
@@ -17,13 +23,24 @@ logger = logging.getLogger(__name__)
 
 NvmeofTopCollector = None
 
+# gateway config and LBG map rarely change; avoid refetching them every poll
+GATEWAYS_CONFIG_TTL = 30
+
 try:
+    import grpc  # type: ignore
+
     from .nvmeof_cli import NvmeofGatewaysConfig
     from .nvmeof_client import NVMeoFClient
     from .nvmeof_conf import get_pool_group_name
 except ImportError as e:
     logger.error("Failed to import NVMeoFClient and related components: %s", e)
 else:
+    # argument-less requests issued on every poll; built once and reused
+    IOSTATS_REQ = NVMeoFClient.pb2.list_namespaces_io_stats_req()
+    THREAD_STATS_REQ = NVMeoFClient.pb2.get_thread_stats_req()
+    GATEWAY_INFO_REQ = NVMeoFClient.pb2.get_gateway_info_req()
+    LIST_SUBSYSTEMS_REQ = NVMeoFClient.pb2.list_subsystems_req()
+
     def get_collector(session_id: Optional[str]):
         MAX_SESSION_TTL = 60 * 60
         return mgr.get_nvmeof_collector(session_id, MAX_SESSION_TTL)
@@ -43,18 +60,22 @@ else:
             }
             ret_status, out, _ = mgr.mon_command(cmd)
             if ret_status == 0 and out is not None:
-                lbg_gws_map = {}
-                gws_info = json.loads(out)
-                for gw in gws_info["Created Gateways:"]:
-                    gw_id = str(gw["gw-id"]).removeprefix("client.")
-                    gw_lbg = int(gw["anagrp-id"])
-                    lbg_gws_map[gw_lbg] = gw_id
-                return lbg_gws_map
+                gws_info = json_loads(out)
+                return {
+                    int(gw["anagrp-id"]): str(gw["gw-id"]).removeprefix("client.")
+                    for gw in gws_info["Created Gateways:"]
+                }
             return {}
         except Exception:  # pylint: disable=broad-except
             logger.exception('Failed to get nvme-gw show command')
             return {}
 
+    _INV_MIB = 1.0 / (1024 * 1024)
+
+    def bytes_to_MB(num_bytes: float):
+        """Simple conversion of bytes to MiB"""
+        return num_bytes * _INV_MIB
+
     class Health:
         def __init__(self):
             self.rc = 0
@@ -76,15 +97,17 @@ else:
                 return 0.0
             return (self.current - self.last) / interval
 
+    IOSTATS_FIELDS = ('read_ops', 'read_bytes', 'read_secs',
+                      'write_ops', 'write_bytes', 'write_secs')
+    IOSTATS_ZERO = (0, 0, 0.0, 0, 0, 0.0)
+
     class PerformanceStats:  # pylint: disable=too-many-instance-attributes
         def __init__(self, bdev: str):
             self.bdev = bdev
-            self.read_ops = Counter()
-            self.read_bytes = Counter()
-            self.read_secs = Counter()
-            self.write_ops = Counter()
-            self.write_bytes = Counter()
-            self.write_secs = Counter()
+            # latest raw counter sample, ordered as IOSTATS_FIELDS
+            self.current: tuple = IOSTATS_ZERO
+            # True once update() has seen the counters standing still
+            self.idle = False
 
             self.read_ops_rate = 0
             self.write_ops_rate = 0
@@ -98,13 +121,32 @@ else:
             self.r_await = 0.0
             self.w_await = 0.0
 
-        def calculate(self, delay: float):
-            self.read_ops_rate = self.read_ops.rate(delay)
-            self.read_bytes_rate = self.read_bytes.rate(delay)
-            self.read_secs_rate = self.read_secs.rate(delay)
-            self.write_ops_rate = self.write_ops.rate(delay)
-            self.write_bytes_rate = self.write_bytes.rate(delay)
-            self.write_secs_rate = self.write_secs.rate(delay)
+            # display strings, refreshed by format_rates()
+            self.display_stale = False
+            self.read_mbytes_str = '0.00'
+            self.r_await_str = '0.00'
+            self.rareq_sz_str = '0.00'
+            self.write_mbytes_str = '0.00'
+            self.w_await_str = '0.00'
+            self.wareq_sz_str = '0.00'
+
+        def update(self, sample: tuple, delay: float):
+            """Store a new counter sample and derive the rates since the previous one"""
+            last, self.current = self.current, sample
+            idle = sample == last
+            if idle and self.idle:
+                # no I/O since the last refresh, every rate is still zero
+                return
+            self.idle = idle
+            self.display_stale = True
+
+            if delay:
+                inv_delay = 1.0 / delay
+                rates = [(cur - prev) * inv_delay for cur, prev in zip(sample, last)]
+            else:
+                rates = [0.0] * len(IOSTATS_FIELDS)
+            (self.read_ops_rate, self.read_bytes_rate, self.read_secs_rate,
+             self.write_ops_rate, self.write_bytes_rate, self.write_secs_rate) = rates
 
             self.total_ops_rate = self.read_ops_rate + self.write_ops_rate
 
@@ -121,6 +163,17 @@ else:
                 self.wareq_sz = 0.0
                 self.w_await = 0.0
 
+        def format_rates(self):
+            if not self.display_stale:
+                return
+            self.display_stale = False
+            self.read_mbytes_str = f"{bytes_to_MB(self.read_bytes_rate):3.2f}"
+            self.r_await_str = f"{self.r_await:3.2f}"
+            self.rareq_sz_str = f"{self.rareq_sz:4.2f}"
+            self.write_mbytes_str = f"{bytes_to_MB(self.write_bytes_rate):3.2f}"
+            self.w_await_str = f"{self.w_await:3.2f}"
+            self.wareq_sz_str = f"{self.wareq_sz:4.2f}"
+
     class ReactorStats:
         def __init__(self, thread: str):
             self.thread = thread
@@ -141,8 +194,11 @@ else:
             self.server_addr = ''
             self.delay: float = 0.0
             self.namespaces = {}
+            self.rbd_images: dict = {}
+            self.qos_status: dict = {}
             self.lbg_to_gateway: dict = {}
             self.subsystems: Any = None
+            self.nqn_set: frozenset = frozenset()
             self.reactor_stats = {}
             self.iostats = {}
             self.gw_info: Any = None
@@ -150,10 +206,9 @@ else:
             self.timestamp = time.time()
             self.health = Health()
             self.clients: dict = {}
-
-        @property
-        def nqn_list(self):
-            return [subsys.nqn for subsys in self.subsystems.subsystems]
+            self._gw_conf: Optional[dict] = None
+            self._gw_conf_timestamp = 0.0
+            self._lbg_gws_maps: dict = {}
 
         @property
         def ready(self) -> bool:
@@ -165,7 +220,7 @@ else:
 
         @property
         def total_subsystems(self) -> int:
-            return len(self.nqn_list)
+            return len(self.nqn_set)
 
         @property
         def total_namespaces_overall(self):
@@ -190,46 +245,56 @@ else:
         def get_sorted_namespaces(self, sort_pos: int, reverse_sort: bool):
             logger.debug("get_sorted_namespaces")
             ns_data = []
+            rbd_images = self.rbd_images[self.subsystem_nqn]
+            iostats = self.iostats
+            lbg_to_gateway = self.lbg_to_gateway
+            lb_group = self.lb_group
+            qos_status = self.qos_status[self.subsystem_nqn]
+            single_gateway = bool(self.tool.args.get('server_addr'))
+            gateway_lbg = self.load_balancing_group if single_gateway else None
+            gateway_daemon_name = self.client.daemon_name if single_gateway else ''
+
             for ns in self.namespaces[self.subsystem_nqn]:
                 bdev_name = ns.bdev_name
+                ns_lbg = ns.load_balancing_group
 
-                daemon_name = ""
-                if self.tool.args.get('server_addr'):
+                if single_gateway:
                     # only show namespaces owned by this gateway's LBG
-                    if ns.load_balancing_group != self.load_balancing_group:
+                    if ns_lbg != gateway_lbg:
                         continue
-                    daemon_name = self.client.daemon_name
+                    daemon_name = gateway_daemon_name
                 else:
-                    daemon_name = self.lbg_to_gateway.get(ns.load_balancing_group, '')
+                    daemon_name = lbg_to_gateway.get(ns_lbg, '')
                 if not daemon_name:
                     logger.warning("No gateway found for load balancing group %s, "
                                    "skipping namespace %s",
-                                   ns.load_balancing_group, ns.nsid)
+                                   ns_lbg, ns.nsid)
                     continue
-                perf_stats = self.iostats.get(daemon_name, {}).get(bdev_name)
+                daemon_iostats = iostats.get(daemon_name)
+                perf_stats = None if daemon_iostats is None else daemon_iostats.get(bdev_name)
                 if perf_stats is None:
                     logger.warning("No iostats for bdev %s on %s, skipping namespace %s",
                                    bdev_name, daemon_name, ns.nsid)
                     continue
-                perf_stats.calculate(self.delay)
+                perf_stats.format_rates()
 
                 ns_data.append((
                     ns.nsid,
-                    f"{ns.rbd_pool_name}/{ns.rbd_image_name}",
+                    rbd_images[ns.nsid],
                     int(perf_stats.total_ops_rate),
                     int(perf_stats.read_ops_rate),
-                    f"{self.bytes_to_MB(perf_stats.read_bytes_rate):3.2f}",
-                    f"{perf_stats.r_await:3.2f}",
-                    f"{perf_stats.rareq_sz:4.2f}",
+                    perf_stats.read_mbytes_str,
+                    perf_stats.r_await_str,
+                    perf_stats.rareq_sz_str,
                     int(perf_stats.write_ops_rate),
-                    f"{self.bytes_to_MB(perf_stats.write_bytes_rate):3.2f}",
-                    f"{perf_stats.w_await:3.2f}",
-                    f"{perf_stats.wareq_sz:4.2f}",
-                    self.lb_group(ns.load_balancing_group),
-                    self.qos_enabled(ns)
+                    perf_stats.write_mbytes_str,
+                    perf_stats.w_await_str,
+                    perf_stats.wareq_sz_str,
+                    lb_group(ns_lbg),
+                    qos_status[ns.nsid]
                 ))
 
-            ns_data.sort(key=lambda t: t[sort_pos], reverse=reverse_sort)
+            ns_data.sort(key=itemgetter(sort_pos), reverse=reverse_sort)
             return ns_data
 
         def get_reactor_data(self, sort_pos: int, reverse_sort: bool):
@@ -243,7 +308,7 @@ else:
                         f"{thread_stats.busy_rate * 100:.2f}",
                         f"{thread_stats.idle_rate * 100:.2f}",
                     ))
-            reactor_data.sort(key=lambda t: t[sort_pos], reverse=reverse_sort)
+            reactor_data.sort(key=itemgetter(sort_pos), reverse=reverse_sort)
             return reactor_data
 
         def get_subsystem_summary_data(self):
@@ -261,8 +326,8 @@ else:
             ]
 
         def qos_enabled(self, ns) -> str:
-            if (ns.rw_ios_per_second or ns.rw_mbytes_per_second
-                    or ns.r_mbytes_per_second or ns.w_mbytes_per_second):
+            if any((ns.rw_ios_per_second, ns.rw_mbytes_per_second,
+                    ns.r_mbytes_per_second, ns.w_mbytes_per_second)):
                 return 'Yes'
             return 'No'
 
@@ -270,11 +335,29 @@ else:
             """Provide a meaningful default when load-balancing is not in use"""
             return "N/A" if grp_id == 0 else f"{grp_id}"
 
-        def bytes_to_MB(self, num_bytes: int, si: int = 1024):
-            """Simple conversion of bytes to MiB or MB"""
-            return (num_bytes / si) / si
-
         # grpc methods
+        def _grpc_failed(self, method_name, client, exc):
+            self.health.rc = -errno.ECONNREFUSED
+            self.health.msg = f"RPC endpoint unavailable at {client.gateway_addr}"
+            logger.error("grpc call to %s failed: %s (%s)", method_name, self.health.msg, exc)
+            if self._is_unavailable(exc):
+                # reconnect on the next poll rather than wait out the channel's backoff
+                NVMeoFClient.drop_channel(client.gateway_addr, client.channel)
+                self.clients = {key: c for key, c in self.clients.items() if c is not client}
+
+        @staticmethod
+        def _is_unavailable(exc):
+            # errors raised by stubs also implement grpc.Call and carry a status code
+            code = getattr(exc, 'code', None)
+            return isinstance(exc, grpc.RpcError) and callable(code) and \
+                code() == grpc.StatusCode.UNAVAILABLE
+
+        def _grpc_succeeded(self, method_name):
+            if self.ready:
+                # don't mask a failure reported by another gateway in this poll
+                self.health.msg = f"{method_name} success"
+            logger.debug("call to %s successful", method_name)
+
         def _call_grpc(self, method_name, request, client=None):
             logger.debug("calling grpc method %s", method_name)
             if not client:
@@ -283,70 +366,115 @@ else:
                 method = getattr(client.stub, method_name)
                 response = method(request)
             except Exception as exc:  # pylint: disable=broad-except
-                self.health.rc = -errno.ECONNREFUSED
-                self.health.msg = f"RPC endpoint unavailable at {client.gateway_addr}"
-                logger.error("grpc call to %s failed: %s (%s)", method_name, self.health.msg, exc)
+                self._grpc_failed(method_name, client, exc)
                 return None
 
-            self.health.msg = f"{method_name} success"
-            logger.debug("call to %s successful", method_name)
+            self._grpc_succeeded(method_name)
             return response
 
-        def _fetch_namespace_iostats(self, client):
-            daemon_name = client.daemon_name
-            logger.debug("fetching iostats for namespaces from %s", daemon_name)
-            stats = self._call_grpc('list_namespaces_io_stats',
-                                    NVMeoFClient.pb2.list_namespaces_io_stats_req(), client)
-            logger.debug("list_namespaces_io_stats stats=%s", stats)
-            if stats is None:
-                return
-            if daemon_name not in self.iostats:
-                self.iostats[daemon_name] = {}
-
+        def _call_grpc_all(self, method_name, request, clients):
+            """Issue the call to every gateway before waiting on any reply.
+
+            Returns (client, response) pairs for the calls that succeeded.
+            """
+            logger.debug("calling grpc method %s on %s gateways", method_name, len(clients))
+            pending = []
+            for client in clients:
+                try:
+                    method = getattr(client.stub, method_name)
+                    pending.append((client, method.future(request)))
+                except Exception as exc:  # pylint: disable=broad-except
+                    self._grpc_failed(method_name, client, exc)
+
+            responses = []
+            for client, future in pending:
+                try:
+                    response = future.result()
+                except Exception as exc:  # pylint: disable=broad-except
+                    self._grpc_failed(method_name, client, exc)
+                    continue
+                self._grpc_succeeded(method_name)
+                responses.append((client, response))
+            return responses
+
+        def _stats_reply_failed(self, method_name, client, stats):
+            """Record an error reply, which carries no stats and a zero tick_rate"""
+            if not stats.status and stats.tick_rate:
+                return False
+            self._grpc_failed(method_name, client,
+                              stats.error_message or f"status {stats.status}")
+            return True
+
+        def _fetch_namespace_iostats(self, clients):
+            responses = self._call_grpc_all('list_namespaces_io_stats', IOSTATS_REQ, clients)
+            for client, stats in responses:
+                if not self._stats_reply_failed('list_namespaces_io_stats', client, stats):
+                    self._update_namespace_iostats(client.daemon_name, stats)
+
+        def _update_namespace_iostats(self, daemon_name, stats):
+            logger.debug("list_namespaces_io_stats from %s stats=%s", daemon_name, stats)
+            daemon_iostats = self.iostats.setdefault(daemon_name, {})
+            delay = self.delay
+            secs_per_tick = 1.0 / stats.tick_rate
             for ns in stats.namespaces:
                 bdev_name = ns.bdev_name
-                if bdev_name not in self.iostats[daemon_name]:
-                    self.iostats[daemon_name][bdev_name] = PerformanceStats(bdev_name)
-
-                ns_stats = self.iostats[daemon_name][bdev_name]
-                ns_stats.read_ops.update(ns.num_read_ops)
-                ns_stats.read_bytes.update(ns.bytes_read)
-                ns_stats.read_secs.update((ns.read_latency_ticks / stats.tick_rate))
-                ns_stats.write_ops.update(ns.num_write_ops)
-                ns_stats.write_bytes.update(ns.bytes_written)
-                ns_stats.write_secs.update((ns.write_latency_ticks / stats.tick_rate))
+                ns_stats = daemon_iostats.get(bdev_name)
+                if ns_stats is None:
+                    ns_stats = daemon_iostats[bdev_name] = PerformanceStats(bdev_name)
+                ns_stats.update((
+                    ns.num_read_ops,
+                    ns.bytes_read,
+                    ns.read_latency_ticks * secs_per_tick,
+                    ns.num_write_ops,
+                    ns.bytes_written,
+                    ns.write_latency_ticks * secs_per_tick,
+                ), delay)
 
         def _fetch_namespaces(self, subsystem_nqn):
             return self._call_grpc(
                 'list_namespaces',
                 NVMeoFClient.pb2.list_namespaces_req(subsystem=subsystem_nqn))
 
-        def _fetch_thread_stats(self, client):
-            gateway_addr = client.gateway_addr
-            logger.debug("fetching thread stats for %s", gateway_addr)
-            stats = self._call_grpc('get_thread_stats',
-                                    NVMeoFClient.pb2.get_thread_stats_req(), client)
-            logger.debug("get_thread_stats stats=%s", stats)
-            if stats is None:
-                return
-            if gateway_addr not in self.reactor_stats:
-                self.reactor_stats[gateway_addr] = {}
-            tick_rate = stats.tick_rate
+        def _fetch_thread_stats(self, clients):
+            responses = self._call_grpc_all('get_thread_stats', THREAD_STATS_REQ, clients)
+            for client, stats in responses:
+                if not self._stats_reply_failed('get_thread_stats', client, stats):
+                    self._update_thread_stats(client.gateway_addr, stats)
+
+        def _update_thread_stats(self, gateway_addr, stats):
+            logger.debug("get_thread_stats from %s stats=%s", gateway_addr, stats)
+            gw_reactor_stats = self.reactor_stats.setdefault(gateway_addr, {})
+            secs_per_tick = 1.0 / stats.tick_rate
             for thread in stats.threads:
                 name = thread.name
-                if name not in self.reactor_stats[gateway_addr]:
-                    self.reactor_stats[gateway_addr][name] = ReactorStats(thread.name)
-                thread_stats = self.reactor_stats[gateway_addr][name]
-                thread_stats.busy_secs.update(thread.busy / tick_rate)
-                thread_stats.idle_secs.update(thread.idle / tick_rate)
+                thread_stats = gw_reactor_stats.get(name)
+                if thread_stats is None:
+                    thread_stats = gw_reactor_stats[name] = ReactorStats(name)
+                thread_stats.busy_secs.update(thread.busy * secs_per_tick)
+                thread_stats.idle_secs.update(thread.idle * secs_per_tick)
 
         def _fetch_gateway_info(self, client):
-            return self._call_grpc(
-                'get_gateway_info',
-                NVMeoFClient.pb2.get_gateway_info_req(), client)
+            return self._call_grpc('get_gateway_info', GATEWAY_INFO_REQ, client)
 
         def _fetch_subsystems(self):
-            return self._call_grpc('list_subsystems', NVMeoFClient.pb2.list_subsystems_req())
+            return self._call_grpc('list_subsystems', LIST_SUBSYSTEMS_REQ)
+
+        def _get_gateways_config(self):
+            now = time.time()
+            if self._gw_conf is None or now - self._gw_conf_timestamp >= GATEWAYS_CONFIG_TTL:
+                self._gw_conf = NvmeofGatewaysConfig.get_gateways_config()
+                self._gw_conf_timestamp = now
+            return self._gw_conf
+
+        def _get_lbg_gws_map(self, service_name: str):
+            now = time.time()
+            cached = self._lbg_gws_maps.get(service_name)
+            if cached and now - cached[0] < GATEWAYS_CONFIG_TTL:
+                return cached[1]
+            lbg_gws_map = get_lbg_gws_map(service_name)
+            if lbg_gws_map:
+                self._lbg_gws_maps[service_name] = (now, lbg_gws_map)
+            return lbg_gws_map
 
         def _get_client(self, group, service_url):
             key = (group, service_url)
@@ -381,19 +509,19 @@ else:
             service_name = self.tool.service_name
             group = self.tool.args.get('group', '')
             if service_name:
-                gw_conf = NvmeofGatewaysConfig.get_gateways_config()
+                gw_conf = self._get_gateways_config()
                 gateways = gw_conf.get("gateways", {})
                 if service_name not in gateways:
                     self.health.rc = -errno.ENOENT
                     self.health.msg = f'Service {service_name} not found'
                     return
-                for gw in gateways[service_name]:
-                    client = self._get_client(group, gw["service_url"])
-                    self._fetch_thread_stats(client)
-                    if not self.ready:
-                        return
+                clients = [self._get_client(group, gw["service_url"])
+                           for gw in gateways[service_name]]
+                self._fetch_thread_stats(clients)
+                if not self.ready:
+                    return
             else:
-                self._fetch_thread_stats(self.client)
+                self._fetch_thread_stats([self.client])
             logger.debug("collect_cpu_data completed")
 
         def _set_subsystem_and_namespaces(self):
@@ -406,13 +534,14 @@ else:
                 self.health.rc = -errno.ECONNREFUSED
                 self.health.msg = "Unable to retrieve a list of subsystems"
                 return
+            self.nqn_set = frozenset(subsys.nqn for subsys in self.subsystems.subsystems)
 
             if self.total_subsystems == 0:
                 self.health.rc = -errno.ENOENT
                 self.health.msg = 'No subsystems found'
                 return
 
-            if self.subsystem_nqn and self.subsystem_nqn not in self.nqn_list:
+            if self.subsystem_nqn and self.subsystem_nqn not in self.nqn_set:
                 logger.error("nqn provided is not present on the gateway")
                 self.health.rc = -errno.ENOENT
                 self.health.msg = "Subsystem NQN provided not found"
@@ -423,6 +552,15 @@ else:
                 return
 
             self.namespaces[self.subsystem_nqn] = namespace_info.namespaces
+            # pool/image names and QoS limits only change when the namespace
+            # list is refetched
+            self.rbd_images[self.subsystem_nqn] = {
+                ns.nsid: f"{ns.rbd_pool_name}/{ns.rbd_image_name}"
+                for ns in namespace_info.namespaces
+            }
+            self.qos_status[self.subsystem_nqn] = {
+                ns.nsid: self.qos_enabled(ns) for ns in namespace_info.namespaces
+            }
             logger.debug("Subsystem '%s' has %s namespaces",
                          self.subsystem_nqn, self.total_namespaces_defined)
 
@@ -436,13 +574,13 @@ else:
             group = self.tool.args.get('group', '')
             if not self.tool.args.get('server_addr'):
                 service_name = self.client.service_name
-                gw_conf = NvmeofGatewaysConfig.get_gateways_config()
+                gw_conf = self._get_gateways_config()
                 gateways = gw_conf.get("gateways", {})
                 if service_name not in gateways:
                     self.health.rc = -errno.ENOENT
                     self.health.msg = f'Service {service_name} not found'
                     return
-                self.lbg_to_gateway = get_lbg_gws_map(service_name)
+                self.lbg_to_gateway = self._get_lbg_gws_map(service_name)
                 if not self.lbg_to_gateway:
                     self.health.rc = -errno.ENOENT
                     self.health.msg = (
@@ -450,17 +588,17 @@ else:
                         f'mapping for service {service_name}'
                     )
                     return
-                for gw in gateways[service_name]:
-                    client = self._get_client(group, gw["service_url"])
-                    self._fetch_namespace_iostats(client)
-                    if not self.ready:
-                        return
+                clients = [self._get_client(group, gw["service_url"])
+                           for gw in gateways[service_name]]
+                self._fetch_namespace_iostats(clients)
+                if not self.ready:
+                    return
             else:
-                self._fetch_namespace_iostats(self.client)
+                self._fetch_namespace_iostats([self.client])
             logger.debug("collect_io_data completed")
 
     class NVMeoFTopTool:
-        def __init__(self, args: dict, data_collector):
+        def __init__(self, args: Mapping[str, Any], data_collector):
             self.args = args
             self.collector = data_collector
             self.reverse_sort = args.get('sort_descending', False)
@@ -496,9 +634,10 @@ else:
 
     class NVMeoFTopCPU(NVMeoFTopTool):
         reactors_headers = ['Gateway', 'Thread Name', 'Busy Rate%', 'Idle Rate%']
-        reactors_template = "{:<30}   {:<30}   {:<20}   {:<20}\n"
+        reactors_template = "%-30s   %-30s   %-20s   %-20s\n"
+        reactors_header_row = reactors_template % tuple(reactors_headers)
 
-        def __init__(self, args: dict, data_collector):
+        def __init__(self, args: Mapping[str, Any], data_collector):
             super().__init__(args, data_collector)
             self.service_name = args.get('service')
 
@@ -514,19 +653,20 @@ else:
             sort_pos = NVMeoFTopCPU.reactors_headers.index(self.sort_key)
             reactor_data = self.collector.get_reactor_data(sort_pos=sort_pos,
                                                            reverse_sort=self.reverse_sort)
-            rows = []
+            buf = io.StringIO()
             if self.args.get('with_timestamp'):
                 timestamp = time.strftime('%Y-%m-%d %H:%M:%S',
                                           time.localtime(self.collector.timestamp))
-                rows.append(f"{timestamp} (delay: {self.collector.delay:.2f}s)\n")
+                buf.write(f"{timestamp} (delay: {self.collector.delay:.2f}s)\n")
 
             if not self.args.get('no_header'):
-                rows.append(NVMeoFTopCPU.reactors_template.format(*NVMeoFTopCPU.reactors_headers))
+                buf.write(NVMeoFTopCPU.reactors_header_row)
+            template = NVMeoFTopCPU.reactors_template
             for reactor in reactor_data:
-                rows.append(NVMeoFTopCPU.reactors_template.format(*reactor))
-            rows.append("\n")
+                buf.write(template % reactor)
+            buf.write("\n")
 
-            return ''.join(rows)
+            return buf.getvalue()
 
     class NVMeoFTopIO(NVMeoFTopTool):
         subsystem_summary_headers = ['Subsystem', 'Namespaces']
@@ -538,11 +678,12 @@ else:
             'w/s', 'wMB/s', 'w_await', 'wareq-sz', 'LBGrp', 'QoS'
         ]
         ns_template = (
-            "{:>4}   {:<40}   {:>7}   {:>6}   {:>6}   {:>7}   {:>8}"
-            "   {:>6}   {:>6}   {:>7}   {:>8}   {:^5}   {:>3}\n"
+            "%4s   %-40s   %7s   %6s   %6s   %7s   %8s"
+            "   %6s   %6s   %7s   %8s   %5s   %3s\n"
         )
+        ns_header_row = ns_template % tuple(ns_headers)
 
-        def __init__(self, args: dict, data_collector):
+        def __init__(self, args: Mapping[str, Any], data_collector):
             super().__init__(args, data_collector)
             self.subsystem_nqn = args.get('subsystem')
 
@@ -561,30 +702,32 @@ else:
             subsystem_summary_data = self.collector.get_subsystem_summary_data()
             overall_summary_data = self.collector.get_overall_summary_data()
 
-            rows = []
+            buf = io.StringIO()
             if self.args.get('with_timestamp'):
                 timestamp = time.strftime('%Y-%m-%d %H:%M:%S',
                                           time.localtime(self.collector.timestamp))
-                rows.append(f"{timestamp} (delay: {self.collector.delay:.2f}s)\n")
+                buf.write(f"{timestamp} (delay: {self.collector.delay:.2f}s)\n")
             if self.args.get('summary'):
                 if self.args.get('server_addr'):
                     summary_row = ""
                     for index, header in enumerate(NVMeoFTopIO.summary_headers):
                         summary_row += f"{header}: {overall_summary_data[index]}  "
-                    rows.append(summary_row + "\n")
+                    buf.write(summary_row + "\n")
                 subsys_summary_row = ""
                 for index, header in enumerate(NVMeoFTopIO.subsystem_summary_headers):
                     subsys_summary_row += f"{header}: {subsystem_summary_data[index]}  "
-                rows.append(subsys_summary_row + "\n\n")
+                buf.write(subsys_summary_row + "\n\n")
             if not self.args.get('no_header'):
-                rows.append(NVMeoFTopIO.ns_template.format(*NVMeoFTopIO.ns_headers))
+                buf.write(NVMeoFTopIO.ns_header_row)
             if ns_data:
-                for ns in ns_data:
-                    rows.append(NVMeoFTopIO.ns_template.format(*ns))
+                template = NVMeoFTopIO.ns_template
+                for *ns_stats, lbg, qos in ns_data:
+                    # %-formatting can't centre, so pad the LBGrp cell here
+                    buf.write(template % (*ns_stats, f"{lbg:^5}", qos))
             else:
-                rows.append("<no namespaces defined>\n")
+                buf.write("<no namespaces defined>\n")
 
-            return ''.join(rows)
+            return buf.getvalue()
 
     @DBCLICommand.Read('nvmeof top cpu', poll=True)
     def nvmeof_top_cpu(_, service: str = '',
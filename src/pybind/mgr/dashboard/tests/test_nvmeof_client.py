@@ -1,11 +1,11 @@
 from typing import Dict, List, NamedTuple, Optional
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import pytest
 
 from ..services import nvmeof_client
-from ..services.nvmeof_client import MaxRecursionDepthError, convert_to_model, \
-    obj_to_namedtuple, pick
+from ..services.nvmeof_client import MaxRecursionDepthError, NVMeoFClient, \
+    convert_to_model, obj_to_namedtuple, pick
 
 
 class TestObjToNamedTuple:
@@ -491,3 +491,59 @@ class TestPick:
             return None
         with pytest.raises(TypeError):
             get_person()
+
+
+class TestGetChannel:
+    @pytest.fixture(autouse=True)
+    def clear_channels(self):
+        with patch.dict(NVMeoFClient._channels, clear=True):  # pylint: disable=protected-access
+            yield
+
+    @staticmethod
+    def new_channel(*_, **__):
+        return MagicMock()
+
+    def test_insecure_channel_reused(self):
+        with patch.object(nvmeof_client.grpc, 'insecure_channel',
+                          side_effect=self.new_channel) as mock_channel:
+            get_channel = NVMeoFClient._get_channel  # pylint: disable=protected-access
+            first = get_channel('10.0.0.1:5500')
+            assert get_channel('10.0.0.1:5500') is first
+            assert get_channel('10.0.0.2:5500') is not first
+        assert mock_channel.call_count == 2
+        _, kwargs = mock_channel.call_args
+        assert ('grpc.max_reconnect_backoff_ms', 5000) in kwargs['options']
+
+    def test_secure_channel_keyed_by_certs(self):
+        with patch.object(nvmeof_client.grpc, 'ssl_channel_credentials'), \
+             patch.object(nvmeof_client.grpc, 'secure_channel',
+                          side_effect=self.new_channel) as mock_channel:
+            get_channel = NVMeoFClient._get_channel  # pylint: disable=protected-access
+            first = get_channel('10.0.0.1:5500', (b'ca', b'key', b'cert'))
+            assert get_channel('10.0.0.1:5500', (b'ca', b'key', b'cert')) is first
+            assert get_channel('10.0.0.1:5500', (b'ca', b'key2', b'cert2')) is not first
+        assert mock_channel.call_count == 2
+
+    def test_rotated_certs_keep_old_channel_open(self):
+        with patch.object(nvmeof_client.grpc, 'ssl_channel_credentials'), \
+             patch.object(nvmeof_client.grpc, 'secure_channel', side_effect=self.new_channel):
+            get_channel = NVMeoFClient._get_channel  # pylint: disable=protected-access
+            # a long-lived client (e.g. a top session) holds the pre-rotation channel
+            held = get_channel('10.0.0.1:5500', (b'ca', b'key', b'cert'))
+            new = get_channel('10.0.0.1:5500', (b'ca', b'key2', b'cert2'))
+            assert new is not held
+            assert get_channel('10.0.0.1:5500', (b'ca', b'key2', b'cert2')) is new
+        held.close.assert_not_called()
+        assert len(NVMeoFClient._channels) == 1  # pylint: disable=protected-access
+
+    def test_drop_channel(self):
+        with patch.object(nvmeof_client.grpc, 'insecure_channel', side_effect=self.new_channel):
+            get_channel = NVMeoFClient._get_channel  # pylint: disable=protected-access
+            failed = get_channel('10.0.0.1:5500')
+            NVMeoFClient.drop_channel('10.0.0.1:5500', failed)
+            fresh = get_channel('10.0.0.1:5500')
+            assert fresh is not failed
+            # a late report about the old channel must not evict its replacement
+            NVMeoFClient.drop_channel('10.0.0.1:5500', failed)
+            assert get_channel('10.0.0.1:5500') is fresh
+        failed.close.assert_not_called()
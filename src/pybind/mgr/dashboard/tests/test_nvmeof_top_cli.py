@@ -1,63 +1,135 @@
 # -*- coding: utf-8 -*-
 import errno
-import time
+import json
+import re
+from types import MappingProxyType, SimpleNamespace
 from unittest.mock import MagicMock, patch
 
 import pytest
 
-from ..services.nvmeof_top_cli import Counter, NvmeofTopCollector, NVMeoFTopCPU, NVMeoFTopIO
+from ..services import nvmeof_top_cli
+from ..services.nvmeof_cli import NvmeofGatewaysConfig
+from ..services.nvmeof_top_cli import Counter, NvmeofTopCollector, \
+    NVMeoFTopCPU, NVMeoFTopIO, PerformanceStats, get_lbg_gws_map
 from ..tests import CLICommandTestMixin, CmdException
 
+_FIXED_TS = 1_700_000_000.0
+_CPU_HEADER_RE = re.compile(r'Gateway|Thread Name|Busy Rate%|Idle Rate%')
+_NAMESPACE_ROWS = (
+    (1, 'pool/image1', 100, 50, '1.00', '0.50', '4.00',
+     50, '1.00', '0.50', '4.00', '1', 'No'),
+    (2, 'pool/image2', 200, 100, '2.00', '1.00', '8.00',
+     100, '2.00', '1.00', '8.00', '2', 'Yes'),
+)
+
+
+def _make_cpu_collector(reactor_data=(), delay=1.5):
+    return MagicMock(spec=NvmeofTopCollector, delay=delay, timestamp=_FIXED_TS,
+                     **{'get_reactor_data.return_value': reactor_data})
+
+
+def _make_io_collector(namespaces=(), delay=2.0):
+    return MagicMock(spec=NvmeofTopCollector, delay=delay, timestamp=_FIXED_TS,
+                     **{'get_sorted_namespaces.return_value': namespaces,
+                        'get_subsystem_summary_data.return_value': [],
+                        'get_overall_summary_data.return_value': []})
+
 
 @pytest.fixture(name='cpu_collector')
 def fixture_cpu_collector():
-    collector = MagicMock()
-    collector.get_reactor_data.return_value = []
-    collector.delay = 1.5
-    collector.timestamp = time.time()
-    return collector
+    return _make_cpu_collector()
 
 
 @pytest.fixture(name='io_collector')
 def fixture_io_collector():
-    collector = MagicMock()
-    collector.get_sorted_namespaces.return_value = []
-    collector.get_subsystem_summary_data.return_value = []
-    collector.get_overall_summary_data.return_value = []
-    collector.delay = 2.0
-    collector.timestamp = time.time()
-    return collector
+    return _make_io_collector()
+
+
+class TestGetLbgGwsMap:
+    def test_map(self):
+        out = json.dumps({'Created Gateways:': [
+            {'gw-id': 'client.nvmeof.gw1', 'anagrp-id': 1},
+            {'gw-id': 'client.nvmeof.gw2', 'anagrp-id': '2'},
+        ]})
+        with patch.object(nvmeof_top_cli, 'get_pool_group_name',
+                          return_value=('rbd', 'group1')), \
+             patch.object(nvmeof_top_cli, 'mgr') as mock_mgr:
+            mock_mgr.mon_command.return_value = (0, out, '')
+            assert get_lbg_gws_map('nvmeof.rbd.group1') == {
+                1: 'nvmeof.gw1',
+                2: 'nvmeof.gw2',
+            }
+
+    def test_mon_command_failure(self):
+        with patch.object(nvmeof_top_cli, 'get_pool_group_name',
+                          return_value=('rbd', 'group1')), \
+             patch.object(nvmeof_top_cli, 'mgr') as mock_mgr:
+            mock_mgr.mon_command.return_value = (-errno.EINVAL, None, 'error')
+            assert get_lbg_gws_map('nvmeof.rbd.group1') == {}
 
 
 class TestCounter:
-    def test_initial_values(self):
-        c = Counter()
-        assert c.current == 0.0
-        assert c.last == 0.0
-
-    def test_update_tracks_last(self):
-        c = Counter()
-        c.update(10.0)
-        assert c.current == 10.0
-        assert c.last == 0.0
-        c.update(20.0)
-        assert c.current == 20.0
-        assert c.last == 10.0
-
-    def test_rate(self):
-        c = Counter()
-        c.update(100.0)
-        c.update(150.0)
-        assert c.rate(5.0) == 10.0
-
-    def test_rate_zero_interval_returns_zero(self):
+    @pytest.mark.parametrize('updates,interval,last,current,rate', [
+        ((), 5.0, 0.0, 0.0, 0.0),
+        ((10.0,), 2.0, 0.0, 10.0, 5.0),
+        ((10.0, 20.0), 1.0, 10.0, 20.0, 10.0),
+        ((100.0, 150.0), 5.0, 100.0, 150.0, 10.0),
+        ((100.0,), 0, 0.0, 100.0, 0.0),
+    ])
+    def test_update_and_rate(self, updates, interval, last, current, rate):
         c = Counter()
-        c.update(100.0)
-        assert c.rate(0) == 0.0
+        for value in updates:
+            c.update(value)
+        assert (c.last, c.current) == (last, current)
+        assert c.rate(interval) == rate
+
+
+class TestPerformanceStats:
+    def test_update(self):
+        stats = PerformanceStats('bdev1')
+        stats.update((100, 0, 0.0, 0, 0, 0.0), 2.0)
+        stats.update((356, 4 * 1024 * 1024, 0.256, 0, 0, 0.0), 2.0)
+        assert stats.current == (356, 4 * 1024 * 1024, 0.256, 0, 0, 0.0)
+        assert stats.read_ops_rate == 128.0
+        assert stats.total_ops_rate == 128.0
+        stats.format_rates()
+        assert stats.read_mbytes_str == '2.00'
+        assert stats.rareq_sz_str == '16.00'
+        assert stats.r_await_str == '1.00'
+        assert stats.write_mbytes_str == '0.00'
+        assert stats.wareq_sz_str == '0.00'
+
+    def test_update_idle(self):
+        stats = PerformanceStats('bdev1')
+        stats.update((100, 4096, 0.1, 0, 0, 0.0), 1.0)
+        assert not stats.idle
+        assert stats.read_ops_rate == 100.0
+
+        stats.update((100, 4096, 0.1, 0, 0, 0.0), 1.0)
+        assert stats.idle
+        assert stats.read_ops_rate == 0.0
+        stats.format_rates()
+        assert stats.read_mbytes_str == '0.00'
+
+        stats.update((100, 4096, 0.1, 0, 0, 0.0), 1.0)
+        with patch.object(nvmeof_top_cli, 'bytes_to_MB') as mock_to_mb:
+            stats.format_rates()
+        mock_to_mb.assert_not_called()
+
+        stats.update((150, 8192, 0.2, 0, 0, 0.0), 1.0)
+        assert not stats.idle
+        assert stats.read_ops_rate == 50.0
+
+    def test_update_zero_delay(self):
+        stats = PerformanceStats('bdev1')
+        stats.update((100, 4096, 0.1, 50, 8192, 0.2), 0)
+        stats.format_rates()
+        assert stats.total_ops_rate == 0.0
+        assert stats.read_mbytes_str == '0.00'
 
 
 class TestNVMeoFTopCPUFormat:
-    default_args = {
+    default_args = MappingProxyType({
         'sort_by': 'Thread Name',
         'sort_descending': False,
         'with_timestamp': False,
@@ -65,46 +137,47 @@ class TestNVMeoFTopCPUFormat:
         'service': '',
         'server_addr': '',
         'group': '',
-    }
+    })
+    no_header_args = MappingProxyType({**default_args, 'no_header': True})
+    with_timestamp_args = MappingProxyType({**default_args, 'with_timestamp': True})
+    bad_sort_args = MappingProxyType({**default_args, 'sort_by': 'NonExistent'})
 
     def test_headers(self, cpu_collector):
         tool = NVMeoFTopCPU(self.default_args, cpu_collector)
         output = tool.format_output()
-        assert 'Gateway' in output
-        assert 'Thread Name' in output
-        assert 'Busy Rate%' in output
-        assert 'Idle Rate%' in output
+        assert len(_CPU_HEADER_RE.findall(output)) == 4
+        assert output.startswith(NVMeoFTopCPU.reactors_header_row)
 
     def test_no_header(self, cpu_collector):
-        tool = NVMeoFTopCPU({**self.default_args, 'no_header': True}, cpu_collector)
+        tool = NVMeoFTopCPU(self.no_header_args, cpu_collector)
         output = tool.format_output()
         assert 'Gateway' not in output
 
     def test_with_timestamp(self, cpu_collector):
-        tool = NVMeoFTopCPU({**self.default_args, 'with_timestamp': True}, cpu_collector)
+        tool = NVMeoFTopCPU(self.with_timestamp_args, cpu_collector)
         output = tool.format_output()
         assert 'delay:' in output
         assert '1.50s' in output
 
-    def test_reactor_data(self, cpu_collector):
-        cpu_collector.get_reactor_data.return_value = [
+    def test_reactor_data(self):
+        collector = _make_cpu_collector(reactor_data=[
             ('192.168.1.1:5500', 'reactor_0', '72.50', '27.50'),
             ('192.168.1.1:5500', 'reactor_1', '45.00', '55.00'),
-        ]
-        tool = NVMeoFTopCPU(self.default_args, cpu_collector)
+        ])
+        tool = NVMeoFTopCPU(self.default_args, collector)
         output = tool.format_output()
         assert '192.168.1.1:5500' in output
         assert 'reactor_0' in output
         assert 'reactor_1' in output
 
     def test_invalid_sort_key(self, cpu_collector):
-        tool = NVMeoFTopCPU({**self.default_args, 'sort_by': 'NonExistent'}, cpu_collector)
+        tool = NVMeoFTopCPU(self.bad_sort_args, cpu_collector)
         with pytest.raises(ValueError, match="Invalid sort key"):
             tool.format_output()
 
 
 class TestNVMeoFTopIOFormat:
-    default_args = {
+    default_args = MappingProxyType({
         'sort_by': 'NSID',
         'sort_descending': False,
         'with_timestamp': False,
@@ -113,7 +186,10 @@ class TestNVMeoFTopIOFormat:
         'subsystem': 'nqn.2024-01.io.spdk:cnode1',
         'server_addr': '',
         'group': '',
-    }
+    })
+    no_header_args = MappingProxyType({**default_args, 'no_header': True})
+    with_timestamp_args = MappingProxyType({**default_args, 'with_timestamp': True})
+    bad_sort_args = MappingProxyType({**default_args, 'sort_by': 'BadKey'})
 
     def test_no_namespaces(self, io_collector):
         tool = NVMeoFTopIO(self.default_args, io_collector)
@@ -125,31 +201,28 @@ class TestNVMeoFTopIOFormat:
         output = tool.format_output()
         assert 'NSID' in output
         assert 'RBD Image' in output
+        assert output.startswith(NVMeoFTopIO.ns_header_row)
 
     def test_no_header(self, io_collector):
-        tool = NVMeoFTopIO({**self.default_args, 'no_header': True}, io_collector)
+        tool = NVMeoFTopIO(self.no_header_args, io_collector)
         output = tool.format_output()
         assert 'NSID' not in output
 
-    def test_namespace_data(self, io_collector):
-        io_collector.get_sorted_namespaces.return_value = [
-            (1, 'pool/image1', 100, 50, '1.00', '0.50', '4.00',
-             50, '1.00', '0.50', '4.00', '1', 'No'),
-            (2, 'pool/image2', 200, 100, '2.00', '1.00', '8.00',
-             100, '2.00', '1.00', '8.00', '2', 'Yes'),
-        ]
-        tool = NVMeoFTopIO(self.default_args, io_collector)
+    def test_namespace_data(self):
+        tool = NVMeoFTopIO(self.default_args, _make_io_collector(namespaces=_NAMESPACE_ROWS))
         output = tool.format_output()
         assert 'pool/image1' in output
         assert 'pool/image2' in output
+        # the bare LBGrp value is centred in its column
+        assert '     4.00     1      No\n' in output
 
     def test_with_timestamp(self, io_collector):
-        tool = NVMeoFTopIO({**self.default_args, 'with_timestamp': True}, io_collector)
+        tool = NVMeoFTopIO(self.with_timestamp_args, io_collector)
         output = tool.format_output()
         assert 'delay:' in output
 
     def test_invalid_sort_key(self, io_collector):
-        tool = NVMeoFTopIO({**self.default_args, 'sort_by': 'BadKey'}, io_collector)
+        tool = NVMeoFTopIO(self.bad_sort_args, io_collector)
         with pytest.raises(ValueError, match="Invalid sort key"):
             tool.format_output()
 
@@ -164,86 +237,194 @@ class TestNvmeofTopCollector:
         c.tool.args = {'group': '', 'server_addr': ''}
         return c
 
+    @pytest.fixture
+    def patched_env(self, collector):
+        """Patch the collector's config and gRPC lookups.
+
+        Defaults describe a single subsystem 'nqn.test' with no namespaces,
+        served by 'myservice' with no gateways and no LBG mapping. Tests
+        override only the return values they care about.
+        """
+        with patch.object(NvmeofGatewaysConfig, 'get_gateways_config',
+                          return_value={'gateways': {'myservice': []}}) as gateways_config, \
+             patch.object(nvmeof_top_cli, 'get_lbg_gws_map',
+                          return_value={}) as lbg_map, \
+             patch.object(collector, '_fetch_subsystems',
+                          return_value=MagicMock(status=0, subsystems=[
+                              MagicMock(nqn='nqn.test')])) as fetch_subsystems, \
+             patch.object(collector, '_fetch_namespaces',
+                          return_value=MagicMock(namespaces=[])) as fetch_namespaces:
+            yield SimpleNamespace(gateways_config=gateways_config, lbg_map=lbg_map,
+                                  fetch_subsystems=fetch_subsystems,
+                                  fetch_namespaces=fetch_namespaces)
+
     def test_grpc_call_failure(self, collector):
         collector.client.gateway_addr = '192.168.1.1:5500'
         collector.client.stub.get_gateway_info.side_effect = Exception('connection refused')
-        collector._call_grpc(  # pylint: disable=protected-access
-            'get_gateway_info', MagicMock(), collector.client)
+        with patch.object(nvmeof_top_cli.NVMeoFClient, 'drop_channel') as mock_drop:
+            collector._call_grpc(  # pylint: disable=protected-access
+                'get_gateway_info', MagicMock(), collector.client)
         assert collector.health.rc == -errno.ECONNREFUSED
         assert collector.health.msg == 'RPC endpoint unavailable at 192.168.1.1:5500'
-
-    def test_collect_cpu_data_service_not_found(self, collector):
-        collector.tool.service_name = 'myservice'
-        with patch('dashboard.services.nvmeof_top_cli.NvmeofGatewaysConfig.get_gateways_config',
-                   return_value={'gateways': {}}):
-            collector.collect_cpu_data()
-        assert collector.health.rc == -errno.ENOENT
-        assert collector.health.msg == 'Service myservice not found'
-
-    def test_collect_io_data_subsystems_unavailable(self, collector):
-        collector.tool.subsystem_nqn = 'nqn.test'
-        with patch.object(collector, '_fetch_subsystems', return_value=None):
-            collector.collect_io_data()
+        mock_drop.assert_not_called()
+
+    def test_grpc_unavailable_drops_client(self, collector):
+        grpc = nvmeof_top_cli.grpc
+        unavailable = grpc.RpcError()
+        unavailable.code = lambda: grpc.StatusCode.UNAVAILABLE
+        collector.clients[('', '')] = collector.client
+        collector.client.stub.get_gateway_info.side_effect = unavailable
+        with patch.object(nvmeof_top_cli.NVMeoFClient, 'drop_channel') as mock_drop:
+            collector._call_grpc(  # pylint: disable=protected-access
+                'get_gateway_info', MagicMock(), collector.client)
+        mock_drop.assert_called_once_with(collector.client.gateway_addr,
+                                          collector.client.channel)
+        assert not collector.clients
+
+    def test_get_sorted_namespaces(self, collector):
+        collector.subsystem_nqn = 'nqn.test'
+        collector.delay = 1.0
+        collector.lbg_to_gateway = {1: 'gw1'}
+        namespaces = []
+        for nsid in (1, 2):
+            ns = MagicMock(nsid=nsid, bdev_name=f'bdev{nsid}', load_balancing_group=1,
+                           rbd_pool_name='pool', rbd_image_name=f'image{nsid}',
+                           rw_ios_per_second=0, rw_mbytes_per_second=0,
+                           r_mbytes_per_second=0, w_mbytes_per_second=0)
+            namespaces.append(ns)
+            stats = PerformanceStats(ns.bdev_name)
+            stats.update((nsid * 10, 0, 0.0, 0, 0, 0.0), collector.delay)
+            collector.iostats.setdefault('gw1', {})[ns.bdev_name] = stats
+        collector.namespaces['nqn.test'] = namespaces
+        collector.rbd_images['nqn.test'] = {1: 'pool/image1', 2: 'pool/image2'}
+        collector.qos_status['nqn.test'] = {1: 'No', 2: 'Yes'}
+
+        ns_data = collector.get_sorted_namespaces(sort_pos=2, reverse_sort=True)
+        assert [row[:4] for row in ns_data] == [
+            (2, 'pool/image2', 20, 20),
+            (1, 'pool/image1', 10, 10),
+        ]
+        assert ns_data[0][11:] == ('1', 'Yes')
+
+    def test_update_namespace_iostats(self, collector):
+        def io_stats(read_ops, read_ticks):
+            ns = MagicMock(bdev_name='bdev1', num_read_ops=read_ops, bytes_read=4096,
+                           read_latency_ticks=read_ticks, num_write_ops=0,
+                           bytes_written=0, write_latency_ticks=0)
+            return MagicMock(tick_rate=1000, namespaces=[ns])
+
+        collector.delay = 2.0
+        update = collector._update_namespace_iostats  # pylint: disable=protected-access
+        update('gw1', io_stats(10, 500))
+        update('gw1', io_stats(30, 1500))
+        ns_stats = collector.iostats['gw1']['bdev1']
+        assert ns_stats.current == (30, 4096, 1.5, 0, 0, 0.0)
+        assert ns_stats.read_ops_rate == 10.0
+        assert ns_stats.r_await == 50.0
+
+    @pytest.mark.parametrize('method,reply,fetch,stats_attr,key_attr', [
+        ('list_namespaces_io_stats', 'list_namespaces_io_stats_info',
+         '_fetch_namespace_iostats', 'iostats', 'daemon_name'),
+        ('get_thread_stats', 'thread_stats_info',
+         '_fetch_thread_stats', 'reactor_stats', 'gateway_addr'),
+    ], ids=['iostats', 'thread_stats'])
+    def test_error_reply_skipped(self, collector, method, reply, fetch, stats_attr, key_attr):
+        pb2 = nvmeof_top_cli.NVMeoFClient.pb2
+        clients = []
+        for i, info in enumerate((getattr(pb2, reply)(status=1, error_message='boom'),
+                                  getattr(pb2, reply)(tick_rate=1000))):
+            client = MagicMock(gateway_addr=f'192.168.1.{i}:5500', daemon_name=f'gw{i}')
+            getattr(client.stub, method).future.return_value.result.return_value = info
+            clients.append(client)
+        collector.delay = 1.0
+        getattr(collector, fetch)(clients)
+        # the healthy gateway is still updated after the error reply
+        assert list(getattr(collector, stats_attr)) == [getattr(clients[1], key_attr)]
         assert collector.health.rc == -errno.ECONNREFUSED
-        assert collector.health.msg == 'Unable to retrieve a list of subsystems'
-
-    def test_collect_io_data_no_subsystems(self, collector):
-        collector.tool.subsystem_nqn = ''
-        mock_subsystems = MagicMock()
-        mock_subsystems.status = 0
-        mock_subsystems.subsystems = []
-        with patch.object(collector, '_fetch_subsystems', return_value=mock_subsystems):
-            collector.collect_io_data()
-        assert collector.health.rc == -errno.ENOENT
-        assert collector.health.msg == 'No subsystems found'
+        assert collector.health.msg == 'RPC endpoint unavailable at 192.168.1.0:5500'
 
-    def test_collect_io_data_nqn_not_found(self, collector):
+    def test_namespace_display_cached(self, collector, patched_env):
         collector.tool.subsystem_nqn = 'nqn.test'
-        mock_subsystems = MagicMock()
-        mock_subsystems.status = 0
-        mock_sub = MagicMock()
-        mock_sub.nqn = 'nqn.other'
-        mock_subsystems.subsystems = [mock_sub]
-        with patch.object(collector, '_fetch_subsystems', return_value=mock_subsystems):
+        collector.tool.args['server_addr'] = '192.168.1.1'
+        patched_env.fetch_namespaces.return_value.namespaces = [
+            MagicMock(nsid=1, rbd_pool_name='pool', rbd_image_name='image1',
+                      rw_ios_per_second=0, rw_mbytes_per_second=0,
+                      r_mbytes_per_second=0, w_mbytes_per_second=0),
+            MagicMock(nsid=2, rbd_pool_name='pool', rbd_image_name='image2',
+                      rw_ios_per_second=0, rw_mbytes_per_second=100,
+                      r_mbytes_per_second=0, w_mbytes_per_second=0),
+        ]
+        with patch.object(collector, '_fetch_namespace_iostats'):
             collector.collect_io_data()
-        assert collector.health.rc == -errno.ENOENT
-        assert collector.health.msg == 'Subsystem NQN provided not found'
+        assert collector.rbd_images['nqn.test'] == {1: 'pool/image1', 2: 'pool/image2'}
+        assert collector.qos_status['nqn.test'] == {1: 'No', 2: 'Yes'}
 
-    def test_collect_io_data_service_not_found(self, collector):
-        collector.tool.subsystem_nqn = 'nqn.test'
-        mock_subsystems = MagicMock()
-        mock_subsystems.status = 0
-        mock_sub = MagicMock()
-        mock_sub.nqn = 'nqn.test'
-        mock_subsystems.subsystems = [mock_sub]
-        mock_namespace_info = MagicMock()
-        mock_namespace_info.namespaces = []
-        with patch.object(collector, '_fetch_subsystems', return_value=mock_subsystems), \
-             patch.object(collector, '_fetch_namespaces', return_value=mock_namespace_info), \
-             patch('dashboard.services.nvmeof_top_cli.NvmeofGatewaysConfig.get_gateways_config',
-                   return_value={'gateways': {}}):
-            collector.collect_io_data()
+    def test_collect_cpu_data_service_not_found(self, collector, patched_env):
+        collector.tool.service_name = 'myservice'
+        patched_env.gateways_config.return_value = {'gateways': {}}
+        collector.collect_cpu_data()
         assert collector.health.rc == -errno.ENOENT
         assert collector.health.msg == 'Service myservice not found'
 
-    def test_collect_io_data_lbg_mapping_failed(self, collector):
-        collector.tool.subsystem_nqn = 'nqn.test'
-        mock_subsystems = MagicMock()
-        mock_subsystems.status = 0
-        mock_sub = MagicMock()
-        mock_sub.nqn = 'nqn.test'
-        mock_subsystems.subsystems = [mock_sub]
-        mock_namespace_info = MagicMock()
-        mock_namespace_info.namespaces = []
-        with patch.object(collector, '_fetch_subsystems', return_value=mock_subsystems), \
-             patch.object(collector, '_fetch_namespaces', return_value=mock_namespace_info), \
-             patch('dashboard.services.nvmeof_top_cli.NvmeofGatewaysConfig.get_gateways_config',
-                   return_value={'gateways': {'myservice': []}}), \
-             patch('dashboard.services.nvmeof_top_cli.get_lbg_gws_map', return_value={}):
-            collector.collect_io_data()
-        assert collector.health.rc == -errno.ENOENT
-        assert collector.health.msg == \
-            'Failed to retrieve load balancing group mapping for service myservice'
+    def test_gateways_config_cached(self, collector, patched_env):
+        collector.tool.service_name = 'myservice'
+        collector.collect_cpu_data()
+        collector.collect_cpu_data()
+        patched_env.gateways_config.assert_called_once()
+        assert collector.ready
+
+    def test_lbg_gws_map_cached(self, collector, patched_env):
+        patched_env.lbg_map.side_effect = [{}, {1: 'gw1'}]
+        get_map = collector._get_lbg_gws_map  # pylint: disable=protected-access
+        assert not get_map('myservice')
+        assert get_map('myservice') == {1: 'gw1'}
+        assert get_map('myservice') == {1: 'gw1'}
+        assert patched_env.lbg_map.call_count == 2
+
+    def test_collect_cpu_data_all_gateways(self, collector, patched_env):
+        collector.tool.service_name = 'myservice'
+        gateways = [{'service_url': f'192.168.1.{i}:5500'} for i in (1, 2, 3)]
+        clients = {}
+        for gw in gateways:
+            client = MagicMock(gateway_addr=gw['service_url'])
+            client.stub.get_thread_stats.future.return_value.result.return_value = \
+                MagicMock(status=0, tick_rate=1, threads=[])
+            clients[gw['service_url']] = client
+        clients['192.168.1.2:5500'].stub.get_thread_stats.future.return_value.result.side_effect = \
+            Exception('connection refused')
+        patched_env.gateways_config.return_value = {'gateways': {'myservice': gateways}}
+        with patch.object(collector, '_get_client',
+                          side_effect=lambda _, url: clients[url]):
+            collector.collect_cpu_data()
+        assert sorted(collector.reactor_stats) == ['192.168.1.1:5500', '192.168.1.3:5500']
+        assert collector.health.rc == -errno.ECONNREFUSED
+        assert collector.health.msg == 'RPC endpoint unavailable at 192.168.1.2:5500'
+
+    @pytest.mark.parametrize('subsystem_nqn,nqns,gateways,rc,msg', [
+        ('nqn.test', None, {'myservice': []},
+         -errno.ECONNREFUSED, 'Unable to retrieve a list of subsystems'),
+        ('', (), {'myservice': []},
+         -errno.ENOENT, 'No subsystems found'),
+        ('nqn.test', ('nqn.other',), {'myservice': []},
+         -errno.ENOENT, 'Subsystem NQN provided not found'),
+        ('nqn.test', ('nqn.test',), {},
+         -errno.ENOENT, 'Service myservice not found'),
+        ('nqn.test', ('nqn.test',), {'myservice': []},
+         -errno.ENOENT, 'Failed to retrieve load balancing group mapping for service myservice'),
+    ], ids=['subsystems_unavailable', 'no_subsystems', 'nqn_not_found',
+            'service_not_found', 'lbg_mapping_failed'])
+    def test_collect_io_data_errors(self, collector, patched_env,
+                                    subsystem_nqn, nqns, gateways, rc, msg):
+        collector.tool.subsystem_nqn = subsystem_nqn
+        if nqns is None:
+            patched_env.fetch_subsystems.return_value = None
+        else:
+            patched_env.fetch_subsystems.return_value.subsystems = \
+                [MagicMock(nqn=nqn) for nqn in nqns]
+        patched_env.gateways_config.return_value = {'gateways': gateways}
+        collector.collect_io_data()
+        assert collector.health.rc == rc
+        assert collector.health.msg == msg
 
 
 class TestNvmeofTopCommands(CLICommandTestMixin):
@@ -257,52 +438,29 @@ class TestNvmeofTopCommands(CLICommandTestMixin):
         assert exc_info.value.retcode == -errno.EINVAL
         assert str(exc_info.value) == "Required argument '--subsystem' missing"
 
-    def test_top_cpu_success(self):
-        with patch('dashboard.services.nvmeof_top_cli.get_collector') as mock_gc:
-            mock_gc.return_value = MagicMock()
-            with patch.object(NVMeoFTopCPU, 'run', return_value=(0, 'cpu output\n')):
-                result = self.exec_nvmeof_cmd('nvmeof top cpu', session_id='sess1')
-                assert 'cpu output' in result
-                mock_gc.assert_called_once_with('sess1')
-
-    def test_top_cpu_run_fail(self):
-        with patch('dashboard.services.nvmeof_top_cli.get_collector') as mock_gc:
-            mock_gc.return_value = MagicMock()
-            with patch.object(NVMeoFTopCPU, 'run',
-                              return_value=(-errno.ENOENT, 'error')):
-                with pytest.raises(CmdException) as exc_info:
-                    self.exec_nvmeof_cmd('nvmeof top cpu', session_id='sess1')
-                assert exc_info.value.retcode == -errno.ENOENT
-                assert str(exc_info.value) == 'error'
-
-    def test_top_io_success(self):
-        with patch('dashboard.services.nvmeof_top_cli.get_collector') as mock_gc:
-            mock_gc.return_value = MagicMock()
-            with patch.object(NVMeoFTopIO, 'run', return_value=(0, 'io output\n')):
-                result = self.exec_nvmeof_cmd(
-                    'nvmeof top io',
-                    subsystem='nqn.test',
-                    session_id='sess2'
-                )
-                assert 'io output' in result
-                mock_gc.assert_called_once_with('sess2')
-
-    def test_top_cpu_get_collector_fail(self):
-        with patch('dashboard.services.nvmeof_top_cli.get_collector',
-                   side_effect=RuntimeError("boom")):
-            with pytest.raises(CmdException) as exc_info:
-                self.exec_nvmeof_cmd('nvmeof top cpu', session_id='sess1')
-            assert exc_info.value.retcode == -errno.EINVAL
-            assert str(exc_info.value) == 'boom'
-
-    def test_top_io_get_collector_fail(self):
-        with patch('dashboard.services.nvmeof_top_cli.get_collector',
-                   side_effect=RuntimeError("boom")):
-            with pytest.raises(CmdException) as exc_info:
-                self.exec_nvmeof_cmd(
-                    'nvmeof top io',
-                    subsystem='nqn.test',
-                    session_id='sess2'
-                )
-            assert exc_info.value.retcode == -errno.EINVAL
-            assert str(exc_info.value) == 'boom'
+    @pytest.mark.parametrize('cmd,tool,kwargs,output', [
+        ('nvmeof top cpu', NVMeoFTopCPU, {'session_id': 'sess1'}, 'cpu output'),
+        ('nvmeof top io', NVMeoFTopIO, {'subsystem': 'nqn.test', 'session_id': 'sess2'},
+         'io output'),
+    ], ids=['cpu', 'io'])
+    def test_top_run_success(self, cmd, tool, kwargs, output):
+        with patch.object(nvmeof_top_cli, 'get_collector') as mock_gc, \
+             patch.object(tool, 'run', return_value=(0, f'{output}\n')):
+            assert output in self.exec_nvmeof_cmd(cmd, **kwargs)
+        mock_gc.assert_called_once_with(kwargs['session_id'])
+
+    @pytest.mark.parametrize('cmd,tool,kwargs,collector_error,run_ret,rc,msg', [
+        ('nvmeof top cpu', NVMeoFTopCPU, {'session_id': 'sess1'},
+         None, (-errno.ENOENT, 'error'), -errno.ENOENT, 'error'),
+        ('nvmeof top cpu', NVMeoFTopCPU, {'session_id': 'sess1'},
+         RuntimeError('boom'), None, -errno.EINVAL, 'boom'),
+        ('nvmeof top io', NVMeoFTopIO, {'subsystem': 'nqn.test', 'session_id': 'sess2'},
+         RuntimeError('boom'), None, -errno.EINVAL, 'boom'),
+    ], ids=['cpu_run_fail', 'cpu_get_collector_fail', 'io_get_collector_fail'])
+    def test_top_run_error(self, cmd, tool, kwargs, collector_error, run_ret, rc, msg):
+        with patch.object(nvmeof_top_cli, 'get_collector', side_effect=collector_error), \
+             patch.object(tool, 'run', return_value=run_ret), \
+             pytest.raises(CmdException) as exc_info:
+            self.exec_nvmeof_cmd(cmd, **kwargs)
+        assert exc_info.value.retcode == rc
+        assert str(exc_info.value) == msg